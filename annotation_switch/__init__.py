@@ -1,14 +1,22 @@
 from __future__ import annotations
-from abc import ABC
 import ast
-from ast import Expression, Constant, Name
+import sys
+from ast import Expression, Constant, Name, Starred
 from ast import Tuple as AstTuple
-from dataclasses import dataclass
-from typing import Any, Optional
+from contextvars import ContextVar
+from functools import lru_cache
+from types import CodeType
+from typing import Any, NamedTuple, Optional
 
 _PREDEFINED_CASE = object()
+_MISSING = object()
 _DEFAULT_KEYWORD = "case"
 
+# Statement kinds, stored as the first item of a case's `(kind, payload, uses_default)` statement.
+_CONSTANT = object()
+_EXPRESSION = object()
+_TUPLE_EXPRESSION = object()
+
 
 __all__ = ["__annotations__", "Switch", "default"]
 
@@ -20,12 +28,6 @@ class SwitchCaseNotValidError(Exception):
 default = "default"
 
 
-@dataclass(frozen=True)
-class OutputWrapper:
-    """Holds the output after the resolution of a Switch statement."""
-    output: Any
-
-
 class Switch:
     """A context-manager implementation of a switch-case.
 
@@ -34,53 +36,53 @@ class Switch:
 
     Note: statement can be any type, but if it's a tuple the last item is evaluated as the return value. Otherwise,
     statement is evaluated as the return value.
+
+    String case identifiers and a string `with_value` are interned, so matching them is usually decided by identity
+    before falling back to string comparison.
     """
 
+    __slots__ = ("with_value", "output", "scope", "keyword", "default_to_none", "_annotations", "_token")
+
     def __init__(self, with_value, scope: Optional[dict] = None, keyword: str = _DEFAULT_KEYWORD, default_to_none: bool = False):
-        self.with_value = with_value
+        self.with_value = sys.intern(with_value) if type(with_value) is str else with_value
         self.output = None
         self.scope = {} if scope is None else scope
-        self.scope["default"] = default
 
         # Options
         self.keyword = keyword
         self.default_to_none = default_to_none
 
-        self._annotations: _IAnnotations = __annotations__
-
     def __enter__(self):
-        self._annotations.clear()
+        """Makes a fresh set of cases the target of `__annotations__` for the duration of the block."""
+        self._annotations: _IAnnotations = _Annotations()
         self._annotations.apply_options(keyword=self.keyword, default_to_none=self.default_to_none)
+        self._token = _state.set(self._annotations)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Resolves value to a case, runs code associated with case, and forces Switch to be unusable as a Switch
-        statement again."""
+        """Resolves value to a case, runs code associated with case, and stores the result in `output`."""
+        _state.reset(self._token)
         self.output = self._annotations.resolve(self.with_value, self.scope)
-        self._annotations.clear()
-        self.__dict__ = {"output": self.output}
-        self.__class__ = OutputWrapper
 
 
-class _IAnnotations(ABC):
-    """When imported, overwrites the current context's `__annotations__` and acts as a means to store cases."""
+class _IAnnotations:
+    """Stores the cases of a single Switch statement."""
+
+    __slots__ = ()
+
     def __setitem__(self, key, value):
         """Updates cases in the current context."""
-        raise NotImplemented
+        raise NotImplementedError
 
     def resolve(self, value, scope):
         """Resolves a value to either the its corresponding case, a default case, or None."""
-        raise NotImplemented
-
-    def clear(self):
-        """Clears the cases in the current context."""
-        raise NotImplemented
+        raise NotImplementedError
 
     def apply_options(self, default_to_none: bool = False, keyword: str = _DEFAULT_KEYWORD):
         """Applies options which will affect how the switch case is resolved."""
-        raise NotImplemented
+        raise NotImplementedError
 
 
-class _ITupleExpression(Expression, ABC):
+class _ITupleExpression(Expression):
     """Interface for an Expression with a Tuple as its body."""
     body: AstTuple
 
@@ -94,6 +96,8 @@ def parse_annotation(val) -> _ITupleExpression:
     if isinstance(a, Expression):
         if not hasattr(a, "body") or not isinstance(a.body, AstTuple):
             raise Exception("Annotation has to be able to be evaluated as a tuple.")
+        if not a.body.elts:
+            raise Exception("Annotation tuple has to end with a statement.")
         return a
     else:
         raise Exception(f"Invalid AST: {a}")
@@ -103,87 +107,116 @@ class CaseIdentifierNotConstantError(Exception):
     pass
 
 
-class _Case:
-    def __init__(self, value_str: str):
-        self.value_str = value_str
-        expr: _ITupleExpression = parse_annotation(value_str)
-
-        identifiers = set()
-        code = None
-        self.is_default_case = False
-
-        for ind, elem in enumerate(expr.body.elts):
-            if not isinstance(elem, Constant) and ind != len(expr.body.elts) - 1:
-                if isinstance(elem, Name) and elem.id == "default":
-                    self.is_default_case = True
-                else:
-                    raise CaseIdentifierNotConstantError(f"{elem} -> case identifier number: {ind + 1}")
-            elif isinstance(elem, Constant) and ind != len(expr.body.elts) - 1:
-                if elem.value == "default":
-                    self.is_default_case = True
-                else:
-                    identifiers.add(elem.value)
-            else:
-                code = expr
+class _Case(NamedTuple):
+    """A parsed case: the identifiers it matches, its statement, and whether it is the default case.
 
-        self.identifiers = identifiers
-        self.code = code
+    `statement` is `(_CONSTANT, value, False)` when the statement is a literal, otherwise `(kind, code, uses_default)`
+    where `kind` is `_TUPLE_EXPRESSION` for a tuple literal and `_EXPRESSION` for anything else, whose result is still
+    unwrapped if it evaluates to a tuple.
+    """
+    identifiers: tuple
+    statement: tuple
+    is_default_case: bool
 
 
-def __c(w):
-    return w()
+def _uses_name(code: CodeType, name: str) -> bool:
+    """Whether `code`, or any code object nested in it (comprehensions, lambdas), looks up `name`."""
+    return name in code.co_names or any(
+        isinstance(const, CodeType) and _uses_name(const, name) for const in code.co_consts
+    )
 
 
-@__c
-class __annotations__(_IAnnotations):
-    cases = {}
-    default = _PREDEFINED_CASE
-    default_to_none = True
-    keyword = "case"
+@lru_cache(maxsize=4096)
+def _build_case(value_str: str) -> _Case:
+    """Parses and compiles an annotation string into a `_Case`, memoized on the source string so a Switch that is
+    entered repeatedly only pays for parsing once."""
+    expr: _ITupleExpression = parse_annotation(value_str)
 
-    def __setitem__(self, key, value):
+    identifiers = []
+    is_default_case = False
 
-        print(key, value)
-        if not key == self.keyword:
-            return
+    *identifier_elts, tail = expr.body.elts
+    for ind, elem in enumerate(identifier_elts, start=1):
+        if isinstance(elem, Constant):
+            value = elem.value
+            if value == "default":
+                is_default_case = True
+            else:
+                identifiers.append(sys.intern(value) if type(value) is str else value)
+        elif isinstance(elem, Name) and elem.id == "default":
+            is_default_case = True
+        else:
+            raise CaseIdentifierNotConstantError(f"{elem} -> case identifier number: {ind}")
 
-        case = _Case(value)
-        for identifier in case.identifiers:
-            self.cases[identifier] = case.code
-        if case.is_default_case:
-            self.default = case.code
+    if isinstance(tail, Constant):
+        statement = (_CONSTANT, tail.value, False)
+    else:
+        # Compiling the statement's source slice lets `compile` parse it in C instead of converting the AST back.
+        source = ast.get_source_segment(value_str, tail)
+        # A starred statement is only valid inside a tuple display, so it is evaluated as a one-item tuple.
+        source = f"({source},)" if isinstance(tail, Starred) else f"({source})"
+        code = compile(source, filename="<case>", mode="eval")
+        kind = _TUPLE_EXPRESSION if isinstance(tail, AstTuple) else _EXPRESSION
+        statement = (kind, code, _uses_name(code, "default"))
+    return _Case(tuple(identifiers), statement, is_default_case)
 
-    def apply_options(self, default_to_none: bool = False, keyword: str = _DEFAULT_KEYWORD):
-        self.default_to_none = default_to_none
-        self.keyword = keyword
 
-    def clear(self):
+class _Annotations(_IAnnotations):
+    __slots__ = ("cases", "default", "default_to_none", "keyword")
+
+    def __init__(self):
         self.cases = {}
         self.default = _PREDEFINED_CASE
-        self.keyword = "case"
         self.default_to_none = True
+        self.keyword = "case"
 
-    def resolve(self, value: Any, scope: dict):
+    def __setitem__(self, key, value):
+        if key != self.keyword:
+            return
 
-        # print(value, scope, __annotations__.default)
+        case = _build_case(value)
+        self.cases.update(dict.fromkeys(case.identifiers, case.statement))
+        if case.is_default_case:
+            self.default = case.statement
 
-        def compile_and_eval(c, s):
-            return eval(compile(c, filename="<unused>", mode="eval"), s)
+    def apply_options(self, default_to_none: bool = False, keyword: str = _DEFAULT_KEYWORD):
+        self.default_to_none = default_to_none
+        self.keyword = sys.intern(keyword)
 
-        try:
-            code_result = compile_and_eval(self.cases[value], scope)
-        except KeyError:
-            if self.default == _PREDEFINED_CASE:
+    def resolve(self, value: Any, scope: dict):
+        statement = self.cases.get(value, _MISSING)
+        if statement is _MISSING:
+            if self.default is _PREDEFINED_CASE:
                 if self.default_to_none:
-                    code_result = (None,)
-                else:
-                    raise SwitchCaseNotValidError(value)
-            else:
-                code_result = compile_and_eval(self.default, scope)
+                    return None
+                raise SwitchCaseNotValidError(value)
+            statement = self.default
 
-        code_result = code_result[-1]
+        kind, payload, uses_default = statement
+        if kind is _CONSTANT:
+            return payload
 
-        if isinstance(code_result, tuple):
+        # Only statements that reference `default` pay for a child dict; the rest run directly in the caller's scope.
+        code_result = eval(payload, {**scope, "default": default} if uses_default else scope)
+        if kind is _TUPLE_EXPRESSION or isinstance(code_result, tuple):
             return code_result[-1]
-        else:
-            return code_result
+        return code_result
+
+
+# The cases of the innermost open Switch in the current thread or task.
+_state: ContextVar[_IAnnotations] = ContextVar("_state")
+
+
+class _AnnotationsProxy:
+    """When imported, overwrites the current context's `__annotations__` and forwards annotations to the cases of the
+    innermost active Switch. Annotations made outside of a Switch are ignored."""
+
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        annotations = _state.get(None)
+        if annotations is not None:
+            annotations[key] = value
+
+
+__annotations__ = _AnnotationsProxy()